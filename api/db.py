@@ -5,6 +5,7 @@ import os
 import re
 import sqlite3
 import unicodedata
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable, List, Optional
 
@@ -22,6 +23,12 @@ DEFAULT_DB_PATH = Path(__file__).resolve().parents[1] / "db" / "terminology.db"
 DB_PATH = Path(os.environ.get("TERMINOLOGY_DB", str(DEFAULT_DB_PATH)))
 
 
+# Same [a-z0-9] translate table as scripts/step4_generate_conceptmaps.py (api does not import scripts)
+_NONALNUM_TABLE = str.maketrans({c: " " for c in map(chr, range(128)) if not ("a" <= c <= "z" or "0" <= c <= "9")})
+_NONALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+@lru_cache(maxsize=100_000)
 def _norm_text(s: Optional[str]) -> str:
     if not s:
         return ""
@@ -30,12 +37,12 @@ def _norm_text(s: Optional[str]) -> str:
             s = _unidecode(s)
     except Exception:
         pass
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(ch for ch in s if not unicodedata.combining(ch))
     s = s.lower()
-    s = re.sub(r"[^a-z0-9]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = s.translate(_NONALNUM_TABLE) if s.isascii() else _NONALNUM_RE.sub(" ", s)
+    return " ".join(s.split())
 
 
 def get_conn() -> sqlite3.Connection:
@@ -3,7 +3,7 @@
 IndicTrans2 translation utilities used in mapping pipeline.
 - Loads local HF model once
 - Simple script-based language detection → IndicTrans2 tags
-- Batch-friendly translate(src->tgt)
+- Batch-friendly translate(src->tgt); tokenization overlaps generation across batches
 
 Notes:
 - Keep generation conservative for terminology translation
@@ -11,6 +11,8 @@ Notes:
 """
 from __future__ import annotations
 
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import torch
@@ -21,19 +23,41 @@ from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 DEFAULT_CKPT_DIR = "c:/Users/rishr/sih026/indictrans2-indic-en-1B"
 
 
+def _cuda_half_dtype() -> torch.dtype:
+    # bf16 on Ampere+ (same tensor-core rate as fp16, fp32 exponent range); fp16 on older GPUs
+    major, _ = torch.cuda.get_device_capability()
+    return torch.bfloat16 if major >= 8 and torch.cuda.is_bf16_supported() else torch.float16
+
+
 class IndicTranslator:
-    def __init__(self, ckpt_dir: str = DEFAULT_CKPT_DIR, device: 'str | None' = None):
+    def __init__(self, ckpt_dir: str = DEFAULT_CKPT_DIR, device: 'str | None' = None, int8: bool = False):
         # Support Python <3.10 by allowing string-annotated union; value handling remains the same
+        # int8: dynamic int8 Linear layers on CPU, bitsandbytes 8-bit weights on CUDA (if installed)
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.tokenizer = AutoTokenizer.from_pretrained(ckpt_dir, trust_remote_code=True)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(ckpt_dir, trust_remote_code=True)
-        # Use fp16 on CUDA to speed up and reduce memory
         if self.device == "cuda":
-            try:
-                self.model.half()
-            except Exception:
-                pass
-        self.model.to(self.device)
+            self.model = None
+            if int8:
+                try:
+                    from transformers import BitsAndBytesConfig
+                    self.model = AutoModelForSeq2SeqLM.from_pretrained(
+                        ckpt_dir, trust_remote_code=True, device_map={"": torch.cuda.current_device()},
+                        quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                    )
+                except Exception as e:
+                    print(f"8-bit load unavailable ({e}); using half precision")
+            if self.model is None:
+                # Load straight into half precision: no fp32 copy in host memory, half the bytes to move
+                try:
+                    self.model = AutoModelForSeq2SeqLM.from_pretrained(ckpt_dir, trust_remote_code=True, torch_dtype=_cuda_half_dtype())
+                except Exception:
+                    self.model = AutoModelForSeq2SeqLM.from_pretrained(ckpt_dir, trust_remote_code=True)
+                self.model.to(self.device)
+        else:
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(ckpt_dir, trust_remote_code=True)
+            if int8:
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model.to(self.device)
         self.model.eval()
         # Avoid cache-related issues
         try:
@@ -41,14 +65,23 @@ class IndicTranslator:
         except Exception:
             pass
 
-    def translate(self, text: str, src_lang: str, tgt_lang: str, max_length: int = 128) -> str:
-        if not text:
-            return ""
-        prompt = f"{src_lang} {tgt_lang} {text}".strip()
-        enc = self.tokenizer([prompt], return_tensors="pt", padding=True, truncation=True, max_length=256).to(self.device)
+    def _autocast(self):
+        # Only useful when the weights stayed fp32 on CUDA, i.e. the torch_dtype half-precision load in __init__
+        # fell back to a default (fp32) load; bf16/fp16 and 8-bit weights already run in reduced precision
+        if self.device == "cuda" and next(self.model.parameters()).dtype == torch.float32:
+            dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            return torch.autocast("cuda", dtype=dtype)
+        return contextlib.nullcontext()
+
+    def _encode(self, texts: List[str], src_lang: str, tgt_lang: str):
+        prompts = [f"{src_lang} {tgt_lang} {t}".strip() if t else "" for t in texts]
+        return self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=256)
+
+    def _generate(self, enc):
+        enc = enc.to(self.device)
         # Fast, deterministic-ish generation for terminology
-        with torch.inference_mode():
-            gen = self.model.generate(
+        with torch.inference_mode(), self._autocast():
+            return self.model.generate(
                 **enc,
                 max_new_tokens=64,
                 num_beams=1,  # speed
@@ -57,30 +90,39 @@ class IndicTranslator:
                 length_penalty=1.0,
                 early_stopping=True,
             )
-        out = self.tokenizer.batch_decode(gen, skip_special_tokens=True)
-        return out[0].strip() if out else ""
+
+    def _decode(self, gen) -> List[str]:
+        return [o.strip() for o in self.tokenizer.batch_decode(gen, skip_special_tokens=True)]
+
+    def translate(self, text: str, src_lang: str, tgt_lang: str, max_length: int = 128) -> str:
+        if not text:
+            return ""
+        out = self._decode(self._generate(self._encode([text], src_lang, tgt_lang)))
+        return out[0] if out else ""
 
     def batch_translate(self, texts: List[str], src_lang: str, tgt_lang: str, max_length: int = 128, batch_size: int = 16) -> List[str]:
         if not texts:
             return []
-        outs_all: List[str] = []
-        for i in range(0, len(texts), batch_size):
-            chunk = texts[i:i+batch_size]
-            prompts = [f"{src_lang} {tgt_lang} {t}".strip() if t else "" for t in chunk]
-            enc = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True, max_length=256).to(self.device)
-            with torch.inference_mode():
-                gen = self.model.generate(
-                    **enc,
-                    max_new_tokens=64,
-                    num_beams=1,  # speed
-                    do_sample=False,
-                    use_cache=False,
-                    length_penalty=1.0,
-                    early_stopping=True,
-                )
-            outs = self.tokenizer.batch_decode(gen, skip_special_tokens=True)
-            outs_all.extend([o.strip() for o in outs])
-        return outs_all
+        # Batch similar lengths together so each batch pads to a close max length; outputs are
+        # scattered back to input order at the end (character length is a cheap token-length proxy)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        ordered = [texts[i] for i in order]
+        chunks = [ordered[i:i+batch_size] for i in range(0, len(ordered), batch_size)]
+        # Tokenize the next chunk and decode the previous one on a helper thread while the model
+        # generates; one worker keeps all tokenizer calls serialized (HF fast tokenizers are not reentrant)
+        decoded = []
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(self._encode, chunks[0], src_lang, tgt_lang)
+            for k in range(len(chunks)):
+                enc = pending.result()
+                if k + 1 < len(chunks):
+                    pending = pool.submit(self._encode, chunks[k + 1], src_lang, tgt_lang)
+                decoded.append(pool.submit(self._decode, self._generate(enc)))
+            outs = [o for fut in decoded for o in fut.result()]
+        result = [""] * len(texts)
+        for i, o in zip(order, outs):
+            result[i] = o
+        return result
 
 
 # --- Language tag detection ---
@@ -5,6 +5,9 @@ Precompute sentence embeddings for ICD alias texts and cache them for fast retri
 - Extracts alias texts using logic consistent with step4 (title/synonym/indexTerm/inclusion/definition)
 - Generates a single vector per ICD code by averaging alias vectors (simple, robust)
 - Saves to db/embeddings/icd_alias_embeddings.npz with arrays: codes (object), vectors (float32)
+- If faiss is installed, also writes db/embeddings/icd_alias_embeddings.faiss (IVF index over the
+  normalized vectors, inner product) which step4 uses for the embeddings shortlist;
+  --index-type opq-pq stores OPQ+PQ compressed codes instead of full vectors
 
 Usage:
   python scripts/precompute_icd_embeddings.py --model sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
@@ -12,11 +15,13 @@ Usage:
 Notes:
 - Requires sentence-transformers and numpy installed
 - Run this once or when ICD cache changes
+- faiss is optional (pip install faiss-cpu); without it step4 falls back to a full dot product
 """
 from __future__ import annotations
 
 import argparse
 import json
+import math
 from pathlib import Path
 from typing import Dict, List
 
@@ -32,6 +37,10 @@ try:
 except Exception:
     _unidecode = None
 
+# Same [a-z0-9] translate table as step4 (see its comment)
+_NONALNUM_TABLE = str.maketrans({c: " " for c in map(chr, range(128)) if not ("a" <= c <= "z" or "0" <= c <= "9")})
+_NONALNUM_RE = re.compile(r"[^a-z0-9]+")
+
 def _normalize_text(s: str) -> str:
     if not s:
         return ""
@@ -40,12 +49,12 @@ def _normalize_text(s: str) -> str:
             s = _unidecode(s)
         except Exception:
             pass
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(ch for ch in s if not unicodedata.combining(ch))
     s = s.lower()
-    s = re.sub(r"[^a-z0-9]+", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = s.translate(_NONALNUM_TABLE) if s.isascii() else _NONALNUM_RE.sub(" ", s)
+    return " ".join(s.split())
 
 def _collect_texts(val) -> List[str]:
     out: List[str] = []
@@ -86,7 +95,7 @@ def _iterate_icd_json_files():
     if not ICD11_DIR.exists():
         return []
     for p in ICD11_DIR.glob("*.json"):
-        if p.name == "_roots.json":
+        if p.name.startswith("_"):  # _roots.json, _token.json
             continue
         yield p
 
@@ -123,9 +132,45 @@ def build_icd_alias_map() -> Dict[str, List[str]]:
         index[code] = dedup
     return index
 
+def build_faiss_index(vectors, out_path: Path, nlist: int = 0, kind: str = "ivf-flat", pq_m: int = 64) -> bool:
+    """Build and persist an IVF (inner product) index over L2-normalized `vectors`.
+    kind="ivf-flat" keeps full float32 vectors in the lists; kind="opq-pq" stores OPQ-rotated,
+    product-quantized codes (pq_m bytes per vector, ~24x smaller for 384-d) at some recall cost.
+    nlist defaults to ~4*sqrt(N), capped so every list gets enough training points."""
+    try:
+        import faiss  # type: ignore
+        import numpy as np
+    except Exception:
+        return False
+    x = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    x = x / norms
+    n, d = x.shape
+    if nlist <= 0:
+        nlist = int(4 * math.sqrt(n))
+    # k-means wants ~39 points per centroid; too many lists for a small corpus just degrades recall
+    nlist = max(1, min(nlist, n // 39))
+    factory = f"IVF{nlist},Flat"
+    if kind == "opq-pq":
+        # 8-bit PQ trains 256 centroids per sub-quantizer; fall back to flat lists when that is impossible
+        if d % pq_m == 0 and n >= 256 * 39:
+            factory = f"OPQ{pq_m},IVF{nlist},PQ{pq_m}"
+        else:
+            print(f"Not enough vectors ({n}) or d={d} not divisible by {pq_m}; building IVF,Flat instead")
+    index = faiss.index_factory(d, factory, faiss.METRIC_INNER_PRODUCT)
+    index.train(x)
+    index.add(x)
+    faiss.write_index(index, str(out_path))
+    return True
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists for the FAISS index (default: ~4*sqrt(N))")
+    parser.add_argument("--index-type", choices=["ivf-flat", "opq-pq"], default="ivf-flat", help="FAISS index layout (opq-pq compresses vectors to --pq-m bytes)")
+    parser.add_argument("--pq-m", type=int, default=64, help="PQ sub-quantizers (bytes per vector) for --index-type opq-pq")
+    parser.add_argument("--no-faiss", action="store_true", help="Skip building the FAISS index")
     args = parser.parse_args()
 
     try:
@@ -183,6 +228,12 @@ def main():
     vectors = np.stack(vectors, axis=0)
     np.savez_compressed(EMBED_DIR / "icd_alias_embeddings.npz", codes=np.array(codes, dtype=object), vectors=vectors.astype('float32'))
     print(f"Saved embeddings for {len(codes)} ICD codes to {EMBED_DIR / 'icd_alias_embeddings.npz'}")
+    if not args.no_faiss:
+        index_path = EMBED_DIR / "icd_alias_embeddings.faiss"
+        if build_faiss_index(vectors, index_path, args.nlist, args.index_type, args.pq_m):
+            print(f"Saved FAISS index to {index_path}")
+        else:
+            print("faiss not installed; skipping index (pip install faiss-cpu)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,15 @@
 # scripts/step2_fetch_icd11.py
 
+import asyncio
 import os
-import time
-import requests
 import json
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import random
+import time
+import httpx
+try:
+    import orjson
+except Exception:
+    orjson = None
 from dotenv import load_dotenv
 from pathlib import Path
 from urllib.parse import urlparse
@@ -22,24 +26,70 @@ BASE_URL = "https://id.who.int/icd/release/11/2024-01/mms"
 OUTPUT_DIR = "db/icd11"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# Global mutable token
-TOKEN = None
+# Snapshot of cached file names; lookups avoid a stat() per URL during the crawl
+CACHED = set(os.listdir(OUTPUT_DIR))
+
+# Max in-flight requests (override with ICD_FETCH_CONCURRENCY); also sizes the client's connection pool.
+# Kept modest: the WHO API rate-limits bursts, and 429s cost more time than the extra parallelism saves.
+CONCURRENCY = max(1, int(os.getenv("ICD_FETCH_CONCURRENCY", "8")))
+
+# Retry budget per URL for network errors and 5xx (exponential backoff); 429s wait without using it
+MAX_ATTEMPTS = 6
+MAX_BACKOFF = 30.0
+# Separate cap on 429 waits so a permanently throttled URL cannot spin forever
+MAX_RATE_LIMIT_WAITS = 20
 
-# Shared session with retries
-session = requests.Session()
-retries = Retry(
-    total=3,
-    backoff_factor=1,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["GET", "POST"]
+# url -> reason for every fetch that gave up; their subtrees are not crawled (reported at the end)
+FAILED: dict[str, str] = {}
+
+# Global mutable token, persisted with its expiry so re-runs skip the OAuth round-trip
+TOKEN = None
+TOKEN_PATH = os.path.join(OUTPUT_DIR, "_token.json")
+
+# Shared HTTP/2 client: one TLS session multiplexes many GETs, kept alive across the crawl
+CLIENT = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY, keepalive_expiry=300),
+    timeout=90.0,
+    headers={"User-Agent": "ICD-Client/1.0"},
 )
-session.mount("https://", HTTPAdapter(max_retries=retries))
-session.mount("http://", HTTPAdapter(max_retries=retries))
+
+# Serializes token refreshes so concurrent 401s trigger a single re-auth
+_TOKEN_LOCK = asyncio.Lock()
+
+
+def _read_saved_token():
+    """Return the persisted token if it is still valid for at least a minute."""
+    try:
+        with open(TOKEN_PATH, encoding="utf-8") as f:
+            saved = json.load(f)
+        if float(saved.get("exp", 0)) > time.time() + 60:
+            return saved.get("access_token")
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _save_token(access_token: str, expires_in: float):
+    """Persist the token (owner-only permissions) with its absolute expiry time.
+    The underscore prefix keeps it out of the ICD entity scans in step4/precompute."""
+    fd = os.open(TOKEN_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        # os.open's mode only applies on creation; tighten a pre-existing file too
+        os.chmod(TOKEN_PATH, 0o600)
+        json.dump({"access_token": access_token, "exp": time.time() + expires_in}, f)
 
 
-def get_access_token():
-    """Get OAuth2 token from WHO ICD API and store globally"""
+async def get_access_token(force: bool = False):
+    """Get OAuth2 token from WHO ICD API and store globally.
+    Reuses the token saved by a previous run unless `force` is set (e.g. after a 401).
+    """
     global TOKEN
+    if not force:
+        saved = _read_saved_token()
+        if saved:
+            TOKEN = saved
+            return TOKEN
     if not CLIENT_ID or not CLIENT_SECRET:
         raise RuntimeError("CLIENT_ID/CLIENT_SECRET missing in .env. Please add them before running.")
 
@@ -50,17 +100,30 @@ def get_access_token():
         "grant_type": "client_credentials"
     }
 
-    headers = {"Content-Type": "application/x-www-form-urlencoded", "User-Agent": "ICD-Client/1.0"}
-    resp = session.post(TOKEN_URL, data=data, headers=headers, timeout=30)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    resp = await CLIENT.post(TOKEN_URL, data=data, headers=headers, timeout=30)
 
     if resp.status_code == 200:
-        TOKEN = resp.json()["access_token"]
+        payload = resp.json()
+        TOKEN = payload["access_token"]
+        try:
+            _save_token(TOKEN, float(payload.get("expires_in", 3600)))
+        except OSError as e:
+            print(f"⚠️ Could not persist token: {e}")
         print("✅ Got access token")
         return TOKEN
     else:
         raise Exception(f"❌ Failed to fetch token: {resp.status_code} {resp.text}")
 
 
+async def _refresh_token(stale: str | None):
+    """Refresh the token unless another coroutine already replaced the stale one."""
+    async with _TOKEN_LOCK:
+        if TOKEN and TOKEN != stale:
+            return TOKEN
+        return await get_access_token(force=stale is not None)
+
+
 def _file_name_from_url(url: str) -> str:
     """Create a stable file name from an ICD URL."""
     path = urlparse(url).path.rstrip("/")
@@ -68,57 +131,87 @@ def _file_name_from_url(url: str) -> str:
     return f"{last}.json"
 
 
-def fetch_icd11(url: str):
+def _load_cached(fname: str):
+    """Return parsed JSON for a cached node, or None if it is not on disk."""
+    if fname not in CACHED:
+        return None
+    out_path = os.path.join(OUTPUT_DIR, fname)
+    if orjson is not None:
+        with open(out_path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(out_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with jitter: ~1s, 2s, 4s, ... capped at MAX_BACKOFF."""
+    return min(MAX_BACKOFF, 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def _retry_after(resp: httpx.Response, default: float) -> float:
+    """Seconds from a Retry-After header (delta-seconds form), else `default`."""
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", default)))
+    except ValueError:
+        return default
+
+
+async def fetch_icd11(url: str):
     """Fetch ICD-11 JSON from WHO API and save it; returns parsed JSON.
-    Refreshes token on 401 and retries once; polite backoff on 429; retries on transient errors.
+    Refreshes token on 401; honours Retry-After on 429 without spending an attempt;
+    retries network errors and 5xx up to MAX_ATTEMPTS with exponential backoff.
+    URLs that still fail are recorded in FAILED.
     """
-    global TOKEN
     fname = _file_name_from_url(url)
     out_path = os.path.join(OUTPUT_DIR, fname)
 
     # Avoid refetch if cached
-    if os.path.exists(out_path):
-        with open(out_path, encoding="utf-8") as f:
-            return json.load(f)
+    cached = _load_cached(fname)
+    if cached is not None:
+        return cached
 
     if not TOKEN:
-        TOKEN = get_access_token()
+        await _refresh_token(None)
 
-    def _do_request():
+    attempts = 0
+    rate_limit_waits = 0
+    while attempts < MAX_ATTEMPTS:
+        attempts += 1
+        token = TOKEN
         headers = {
-            "Authorization": f"Bearer {TOKEN}",
+            "Authorization": f"Bearer {token}",
             "Accept": "application/json",
             "API-Version": "v2",
             "Accept-Language": "en",
-            "User-Agent": "ICD-Client/1.0"
         }
-        return session.get(url, headers=headers, timeout=90)
-
-    # Try up to 3 attempts for network stability
-    attempts = 0
-    while attempts < 3:
-        attempts += 1
         try:
-            resp = _do_request()
-        except requests.exceptions.RequestException as e:
-            if attempts < 3:
-                time.sleep(2 * attempts)
+            resp = await CLIENT.get(url, headers=headers)
+        except httpx.TransportError as e:
+            if attempts < MAX_ATTEMPTS:
+                await asyncio.sleep(_backoff(attempts))
                 continue
             print(f"❌ Network error fetching {url}: {e}")
+            FAILED[url] = f"network: {e}"
             return None
 
-        # Handle rate limiting
+        # Handle rate limiting: wait as asked, this does not count as a failed attempt
         if resp.status_code == 429:
-            retry_after = int(resp.headers.get("Retry-After", "1"))
-            time.sleep(min(retry_after, 5))
+            rate_limit_waits += 1
+            if rate_limit_waits > MAX_RATE_LIMIT_WAITS:
+                print(f"❌ Still rate limited after {MAX_RATE_LIMIT_WAITS} waits: {url}")
+                FAILED[url] = "429"
+                return None
+            attempts -= 1
+            await asyncio.sleep(min(_retry_after(resp, _backoff(rate_limit_waits)), 60.0))
             continue
 
         # If token expired/invalid, refresh once and retry
         if resp.status_code == 401:
             try:
-                TOKEN = get_access_token()
+                await _refresh_token(token)
             except Exception as e:
                 print(f"❌ Unable to refresh token: {e}")
+                FAILED[url] = f"token refresh: {e}"
                 return None
             # retry next loop
             continue
@@ -128,45 +221,58 @@ def fetch_icd11(url: str):
                 data = resp.json()
             except ValueError:
                 print(f"❌ Invalid JSON for {url}")
+                FAILED[url] = "invalid JSON"
                 return None
             with open(out_path, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
+            CACHED.add(fname)
             print(f"✅ Saved {fname}")
             return data
         else:
             # Transient server errors: retry
             if resp.status_code in (500, 502, 503, 504):
-                time.sleep(1 * attempts)
+                if attempts < MAX_ATTEMPTS:
+                    await asyncio.sleep(_backoff(attempts))
                 continue
             print(f"❌ Error {resp.status_code}: {resp.text}")
+            FAILED[url] = f"HTTP {resp.status_code}"
             return None
 
+    print(f"❌ Giving up on {url} after {MAX_ATTEMPTS} attempts")
+    FAILED.setdefault(url, f"HTTP {resp.status_code}")
     return None
 
 
-def crawl_icd_tree(start_url: str, seen: set | None = None):
-    """Recursively fetch all nodes reachable via 'child' links starting at start_url."""
+async def crawl_icd_tree(start_url: str, seen: set | None = None):
+    """Fetch all nodes reachable via 'child' links starting at start_url.
+    Walks the tree level by level, fetching each level concurrently (bounded by CONCURRENCY).
+    """
     if seen is None:
         seen = set()
-    if start_url in seen:
-        return
-    seen.add(start_url)
-
-    data = fetch_icd11(start_url)
-    if not data:
-        return
+    sem = asyncio.Semaphore(CONCURRENCY)
 
-    # Be polite to the API
-    time.sleep(0.2)
+    async def _fetch(url: str):
+        async with sem:
+            data = await fetch_icd11(url)
+            # Be polite to the API
+            await asyncio.sleep(0.2)
+            return data
 
-    for child_url in data.get("child", []):
-        crawl_icd_tree(child_url, seen)
+    frontier = [start_url]
+    while frontier:
+        batch = [u for u in dict.fromkeys(frontier) if u not in seen]
+        seen.update(batch)
+        results = await asyncio.gather(*(_fetch(u) for u in batch))
+        missing = sum(1 for data in results if not data)
+        if missing:
+            print(f"⚠️ {missing} node(s) failed at this level; their subtrees are skipped (re-run to retry)")
+        frontier = [child for data in results if data for child in data.get("child", [])]
 
 
-def find_tm2_child(root_json):
-    """Find the TM2 child URL from root /mms JSON"""
+async def find_tm2_child(root_json):
+    """Find the TM2 child URL from root /mms JSON (fetch_icd11 serves cached chapters from disk)."""
     for child_url in root_json.get("child", []):
-        child_data = fetch_icd11(child_url)
+        child_data = await fetch_icd11(child_url)
         if child_data:
             title = child_data.get("title", {}).get("@value", "").lower()
             if "traditional medicine" in title or "tm2" in title or "tm" in title:
@@ -174,24 +280,27 @@ def find_tm2_child(root_json):
     return None
 
 
-if __name__ == "__main__":
-    get_access_token()
-
-    # Fetch and cache Biomedicine root, then crawl its tree
-    root_json = fetch_icd11(BASE_URL)
-    tm2_url = None
-    if root_json:
-        print("🔎 Crawling ICD-11 Biomedicine tree...")
-        crawl_icd_tree(BASE_URL)
-
-        # Find and crawl TM2 if present
-        print("🔎 Looking for TM2 subtree...")
-        tm2_url = find_tm2_child(root_json)
-        if tm2_url:
-            print(f"🔎 Crawling TM2 tree at {tm2_url} ...")
-            crawl_icd_tree(tm2_url)
-        else:
-            print("❌ TM2 child not found")
+async def main():
+    try:
+        await get_access_token()
+
+        # Fetch and cache Biomedicine root, then crawl its tree
+        root_json = await fetch_icd11(BASE_URL)
+        tm2_url = None
+        if root_json:
+            print("🔎 Crawling ICD-11 Biomedicine tree...")
+            await crawl_icd_tree(BASE_URL)
+
+            # Find and crawl TM2 if present
+            print("🔎 Looking for TM2 subtree...")
+            tm2_url = await find_tm2_child(root_json)
+            if tm2_url:
+                print(f"🔎 Crawling TM2 tree at {tm2_url} ...")
+                await crawl_icd_tree(tm2_url)
+            else:
+                print("❌ TM2 child not found")
+    finally:
+        await CLIENT.aclose()
 
     # Persist roots metadata for downstream scripts
     roots_meta = {
@@ -203,4 +312,13 @@ if __name__ == "__main__":
         json.dump(roots_meta, f, indent=2)
     print(f"📝 Wrote roots metadata to {meta_path}")
 
+    if FAILED:
+        print(f"⚠️ {len(FAILED)} URL(s) could not be fetched; their subtrees are missing. Re-run to retry:")
+        for url, reason in FAILED.items():
+            print(f"   {url} ({reason})")
+
     print("✅ ICD-11 content cached under db/icd11")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
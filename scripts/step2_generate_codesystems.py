@@ -1,9 +1,17 @@
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import Optional, Sequence, Tuple
 
 import pandas as pd
 
+# Optional pyarrow for faster CSV parsing
+try:
+    import pyarrow as pa  # type: ignore
+except Exception:
+    pa = None
+
 # Base paths
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
@@ -58,7 +66,6 @@ def _coalesce_definition(df: pd.DataFrame) -> pd.Series:
             continue
         # Fill missing/empty only
         candidate = df[col].astype("string").fillna("").str.strip()
-        result = result.mask(result.astype(str).str.len() > 0, result)  # keep already filled
         result = result.where(result.astype(str).str.len() > 0, candidate)  # fill empties
 
     return result.fillna("")
@@ -72,8 +79,11 @@ def _safe_series(df: pd.DataFrame, col: Optional[str]) -> pd.Series:
 
 
 def csv_to_codesystem(file_path: Path, system_url: str, title: str) -> dict:
-    # Read CSV robustly — keep strings as-is
-    df = pd.read_csv(file_path, dtype=str, keep_default_na=False, na_values=["", "NA", "NaN", "nan"])  # type: ignore
+    # Read CSV robustly — keep strings as-is (multi-threaded Arrow parser when available)
+    read_opts = dict(dtype=str, keep_default_na=False, na_values=["", "NA", "NaN", "nan"])
+    if pa is not None:
+        read_opts.update(engine="pyarrow", dtype_backend="pyarrow")
+    df = pd.read_csv(file_path, **read_opts)  # type: ignore
     df = _normalize_columns(df)
 
     # Try header-based mapping first
@@ -91,21 +101,15 @@ def csv_to_codesystem(file_path: Path, system_url: str, title: str) -> dict:
     definition = _coalesce_definition(df)
 
     # Drop rows where code or display is empty
-    keep_mask = (code.str.len() > 0) & (display.str.len() > 0)
+    keep_mask = code.str.len().gt(0) & display.str.len().gt(0)
     df_out = pd.DataFrame({
-        "code": code.where(keep_mask, None),
-        "display": display.where(keep_mask, None),
-        "definition": definition.where(keep_mask, ""),
-    }).dropna(subset=["code", "display"]).reset_index(drop=True)
-
-    # Deduplicate by code (keep first)
-    df_out = df_out.drop_duplicates(subset=["code"], keep="first")
+        "code": code[keep_mask],
+        "display": display[keep_mask],
+        "definition": definition[keep_mask],
+    }).reset_index(drop=True)
 
-    # Optional: sort by code for stable output
-    try:
-        df_out = df_out.sort_values(by=["code"])  # if numeric-like codes appear, still fine as strings
-    except Exception:
-        pass
+    # Deduplicate by code (keep first), then stable sort by code for reproducible output
+    df_out = df_out.drop_duplicates(subset=["code"], keep="first").sort_values(by=["code"], kind="mergesort")
 
     codesystem = {
         "resourceType": "CodeSystem",
@@ -120,53 +124,64 @@ def csv_to_codesystem(file_path: Path, system_url: str, title: str) -> dict:
         "concept": [],
     }
 
-    for _, row in df_out.iterrows():
+    for row in df_out.to_dict("records"):
         entry = {
             "code": str(row["code"]),
             "display": str(row["display"]),
         }
-        if str(row.get("definition", "")).strip():
+        if str(row.get("definition") or "").strip():
             entry["definition"] = str(row["definition"])
         codesystem["concept"].append(entry)
 
     return codesystem
 
 
-def main():
-    mappings = {
-        "ayurveda.csv": {
-            "url": "http://namaste.gov.in/fhir/ayurveda",
-            "title": "NATIONAL AYURVEDA MORBIDITY CODES",
-        },
-        "siddha.csv": {
-            "url": "http://namaste.gov.in/fhir/siddha",
-            "title": "NATIONAL SIDDHA MORBIDITY CODES",
-        },
-        "unani.csv": {
-            "url": "http://namaste.gov.in/fhir/unani",
-            "title": "NATIONAL UNANI MORBIDITY CODES",
-        },
-    }
+MAPPINGS = {
+    "ayurveda.csv": {
+        "url": "http://namaste.gov.in/fhir/ayurveda",
+        "title": "NATIONAL AYURVEDA MORBIDITY CODES",
+    },
+    "siddha.csv": {
+        "url": "http://namaste.gov.in/fhir/siddha",
+        "title": "NATIONAL SIDDHA MORBIDITY CODES",
+    },
+    "unani.csv": {
+        "url": "http://namaste.gov.in/fhir/unani",
+        "title": "NATIONAL UNANI MORBIDITY CODES",
+    },
+}
 
-    for csv_file, meta in mappings.items():
-        in_path = DATA_DIR / csv_file
-        if not in_path.exists():
-            print(f"❌ Missing input CSV: {in_path}")
-            continue
 
-        codesystem = csv_to_codesystem(
-            in_path,
-            meta["url"],
-            meta["title"],
-        )
+def process_one(item: Tuple[str, dict]) -> Tuple[str, Optional[Path], int]:
+    """Convert one NAMASTE CSV and write its CodeSystem JSON (runs in a worker process)."""
+    csv_file, meta = item
+    in_path = DATA_DIR / csv_file
+    if not in_path.exists():
+        return csv_file, None, 0
 
-        out_path = OUTPUT_DIR / f"{csv_file.replace('.csv', '')}_codesystem.json"
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(codesystem, f, indent=2, ensure_ascii=False)
+    codesystem = csv_to_codesystem(
+        in_path,
+        meta["url"],
+        meta["title"],
+    )
 
-        count = len(codesystem.get("concept", []))
-        print(f"✅ Generated {meta['title']} at {out_path} (concepts: {count})")
+    out_path = OUTPUT_DIR / f"{csv_file.replace('.csv', '')}_codesystem.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(codesystem, f, indent=2, ensure_ascii=False)
+
+    return csv_file, out_path, len(codesystem.get("concept", []))
+
+
+def main():
+    # Each CSV is an independent pandas pipeline; run them on separate cores
+    workers = max(1, min(len(MAPPINGS), os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        for csv_file, out_path, count in ex.map(process_one, MAPPINGS.items()):
+            if out_path is None:
+                print(f"❌ Missing input CSV: {DATA_DIR / csv_file}")
+                continue
+            print(f"✅ Generated {MAPPINGS[csv_file]['title']} at {out_path} (concepts: {count})")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
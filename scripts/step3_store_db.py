@@ -15,15 +15,22 @@ Outputs:
 Notes:
 - Preserves original codes and labels without modification
 - Uses foreign keys and uniqueness constraints to avoid duplicates
+- Re-runs only add new concepts; pass --merge to also refresh labels of existing ones
 """
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
 import sqlite3
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import orjson
+except Exception:
+    orjson = None
 
 DB_PATH = Path("db/terminology.db")
 ICD11_DIR = Path("db/icd11")
@@ -82,6 +89,12 @@ conn.commit()
 
 # --- HELPERS ---
 
+def _read_json(path: Path):
+    """Parse a JSON file straight from bytes (orjson when available)."""
+    data = path.read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
 def upsert_codesystem(url: str, name: Optional[str] = None, title: Optional[str] = None,
                       version: Optional[str] = None, status: Optional[str] = None) -> int:
     cursor.execute("SELECT id FROM CodeSystem WHERE url=?", (url,))
@@ -101,33 +114,41 @@ def upsert_codesystem(url: str, name: Optional[str] = None, title: Optional[str]
     return cursor.lastrowid
 
 
-def insert_concept(codesystem_id: int, code: str, display: str = "", definition: str = ""):
-    if not code:
+def insert_concepts(codesystem_id: int, rows: Iterable[Tuple[str, str, str]], merge: bool = False):
+    """Bulk-insert (code, display, definition) rows for one CodeSystem with executemany.
+    With `merge`, existing concepts also get their display/definition refreshed.
+    """
+    batch = [(codesystem_id, code, display, definition) for code, display, definition in rows if code]
+    if not batch:
         return
+    insert_sql = "INSERT OR IGNORE INTO Concept (codesystem_id, code, display, definition) VALUES (?, ?, ?, ?)"
+    # For existing concepts, refresh display/definition when new non-empty values are provided
+    update_sql = "UPDATE Concept SET display=COALESCE(NULLIF(?, ''), display), definition=COALESCE(NULLIF(?, ''), definition) WHERE codesystem_id=? AND code=?"
     try:
-        cursor.execute(
-            "INSERT OR IGNORE INTO Concept (codesystem_id, code, display, definition) VALUES (?, ?, ?, ?)",
-            (codesystem_id, code, display, definition),
-        )
-        # For existing concepts, refresh display/definition when new non-empty values are provided
-        cursor.execute(
-            "UPDATE Concept SET display=COALESCE(NULLIF(?, ''), display), definition=COALESCE(NULLIF(?, ''), definition) WHERE codesystem_id=? AND code=?",
-            (display, definition, codesystem_id, code),
-        )
-    except sqlite3.IntegrityError as e:
-        print(f"Concept insert error for {code}: {e}")
+        cursor.executemany(insert_sql, batch)
+        if merge:
+            cursor.executemany(update_sql, [(display, definition, cs_id, code) for cs_id, code, display, definition in batch])
+    except sqlite3.IntegrityError:
+        # Retry row by row so one bad concept does not drop the rest of the batch (both statements are
+        # idempotent, so rows the failed executemany already wrote are simply ignored/re-applied)
+        for cs_id, code, display, definition in batch:
+            try:
+                cursor.execute(insert_sql, (cs_id, code, display, definition))
+                if merge:
+                    cursor.execute(update_sql, (display, definition, cs_id, code))
+            except sqlite3.IntegrityError as e:
+                print(f"Concept insert error for {code}: {e}")
 
 
 # --- LOAD NAMASTE FHIR CodeSystem JSONs ---
 
-def load_namaste_codesystems():
+def load_namaste_codesystems(merge: bool = False):
     if not CODESYSTEM_JSON_DIR.exists():
         print(f"Warning: {CODESYSTEM_JSON_DIR} not found. Run step2_generate_codesystems.py first.")
         return
     for json_file in sorted(CODESYSTEM_JSON_DIR.glob("*_codesystem.json")):
         try:
-            with open(json_file, encoding="utf-8") as f:
-                cs = json.load(f)
+            cs = _read_json(json_file)
             if cs.get("resourceType") != "CodeSystem":
                 print(f"Skipping non-CodeSystem file: {json_file}")
                 continue
@@ -140,11 +161,13 @@ def load_namaste_codesystems():
                 print(f"Skipping {json_file}: missing url")
                 continue
             cs_id = upsert_codesystem(url=url, name=name, title=title, version=version, status=status)
-            count = 0
-            for c in cs.get("concept", []) or []:
-                insert_concept(cs_id, code=str(c.get("code", "")), display=str(c.get("display", "")), definition=str(c.get("definition", "")))
-                count += 1
-            print(f"✅ Inserted {count} concepts into {title} ({url})")
+            rows = [
+                (str(c.get("code", "")), str(c.get("display", "")), str(c.get("definition", "")))
+                for c in cs.get("concept", []) or []
+            ]
+            insert_concepts(cs_id, rows, merge=merge)
+            conn.commit()
+            print(f"✅ Inserted {len(rows)} concepts into {title} ({url})")
         except Exception as e:
             print(f"Error loading {json_file}: {e}")
 
@@ -158,11 +181,11 @@ def _file_from_url(u: str) -> Path:
     return ICD11_DIR / f"{last}.json"
 
 
-def insert_icd11_tree(root_url: str, codesystem_url: str, name: str, title: str, version: str):
+def insert_icd11_tree(root_url: str, codesystem_url: str, name: str, title: str, version: str, merge: bool = False):
     """Load ICD-11 nodes from the local cache by walking child links starting at root.
     Optimizations:
     - Iterative traversal to avoid deep recursion
-    - Batch commits for faster inserts
+    - Rows are buffered and flushed with executemany, one commit per batch
     - Progress logging
     """
     cs_id = upsert_codesystem(url=codesystem_url, name=name, title=title, version=version, status="active")
@@ -172,6 +195,7 @@ def insert_icd11_tree(root_url: str, codesystem_url: str, name: str, title: str,
     seen: set[str] = set()
     q = deque([root_url])
     processed = 0
+    pending: list[Tuple[str, str, str]] = []
 
     while q:
         url = q.popleft()
@@ -182,8 +206,7 @@ def insert_icd11_tree(root_url: str, codesystem_url: str, name: str, title: str,
         if not file.exists():
             continue
         try:
-            with open(file, encoding="utf-8") as f:
-                data = json.load(f)
+            data = _read_json(file)
         except Exception:
             continue
         code = data.get("code")
@@ -191,9 +214,11 @@ def insert_icd11_tree(root_url: str, codesystem_url: str, name: str, title: str,
         display = title_obj.get("@value", "")
         definition = (data.get("definition", {}) or {}).get("@value", "")
         if code:
-            insert_concept(cs_id, code=code, display=display, definition=definition)
+            pending.append((code, display, definition))
             processed += 1
             if processed % 1000 == 0:
+                insert_concepts(cs_id, pending, merge=merge)
+                pending.clear()
                 conn.commit()
                 print(f"   • Inserted {processed} concepts into {title}...")
         # enqueue children
@@ -201,27 +226,31 @@ def insert_icd11_tree(root_url: str, codesystem_url: str, name: str, title: str,
             if isinstance(child, str):
                 q.append(child)
 
+    insert_concepts(cs_id, pending, merge=merge)
     conn.commit()
     print(f"✅ Inserted ICD-11 concepts for {title} ({codesystem_url}): {processed} concepts")
 
 
 # --- MAIN ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate terminology.db with CodeSystem + Concept rows")
+    parser.add_argument("--merge", action="store_true", help="Refresh display/definition of concepts already in the DB")
+    args = parser.parse_args()
+
     # Clear existing concepts/maps but keep CodeSystem rows if re-runnable? We'll keep incremental behavior.
     # If a clean rebuild is desired, uncomment below lines.
     # cursor.execute("DELETE FROM ConceptMap"); cursor.execute("DELETE FROM Concept"); cursor.execute("DELETE FROM CodeSystem")
     # conn.commit()
 
     # 1) Load NAMASTE CodeSystem JSONs → CodeSystem + Concept
-    load_namaste_codesystems()
+    load_namaste_codesystems(merge=args.merge)
 
     # 2) Load ICD-11 trees if cache exists
     roots_path = ICD11_DIR / "_roots.json"
     if not roots_path.exists():
         print("Warning: db/icd11/_roots.json not found. Run step2_fetch_icd11.py first.")
     else:
-        with open(roots_path, encoding="utf-8") as f:
-            roots = json.load(f)
+        roots = _read_json(roots_path)
         # Biomedicine
         insert_icd11_tree(
             root_url=roots.get("biomedicine_root", ICD_BIOMED_URL),
@@ -229,6 +258,7 @@ if __name__ == "__main__":
             name="ICD11MMS",
             title="ICD-11 MMS 2024-01 Biomedicine",
             version="2024-01",
+            merge=args.merge,
         )
         # TM2
         tm2_root: Optional[str] = roots.get("tm2_root")
@@ -239,6 +269,7 @@ if __name__ == "__main__":
                 name="ICD11TM2",
                 title="ICD-11 Traditional Medicine Module 2",
                 version="2024-01",
+                merge=args.merge,
             )
         else:
             print("Warning: TM2 root not found in _roots.json; TM2 concepts not loaded.")
@@ -3,15 +3,27 @@
 import sqlite3
 import json
 import re
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from typing import Iterable
+
+try:
+    import orjson  # optional: faster JSON writer
+except Exception:  # pragma: no cover
+    orjson = None
 
 DB_PATH = "db/terminology.db"
 OUTPUT_DIR = Path("db/valuesets")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
 # FHIR ValueSet generator using CodeSystem/Concept schema
 
+@lru_cache(maxsize=1024)
 def slug_from_url(url: str) -> str:
     u = url.lower()
     if "namaste.gov.in" in u:
@@ -27,11 +39,11 @@ def slug_from_url(url: str) -> str:
             return "icd-11-biomedicine"
         return "icd-11-tm2"
     # Fallback: sanitize full URL
-    return re.sub(r"[^a-z0-9]+", "-", u).strip("-")
+    return _SLUG_RE.sub("-", u).strip("-")
 
 
-def build_valueset(cs_url: str, concepts: list[tuple[str, str]]):
-    # concepts: list of (code, display)
+def build_valueset(cs_url: str, concepts: Iterable[tuple[str, str]]):
+    # concepts: iterable of (code, display), consumed once
     now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
     slug = slug_from_url(cs_url)
     return {
@@ -56,32 +68,57 @@ def build_valueset(cs_url: str, concepts: list[tuple[str, str]]):
     }
 
 
+def open_db(path: str = DB_PATH) -> sqlite3.Connection:
+    # Read-only: this script only reads, so it must not change the DB's journal mode (or create it).
+    # The remaining pragmas are per-connection: big page cache, in-memory temp, mmap reads
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.execute("PRAGMA cache_size=-200000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=1073741824")
+    return conn
+
+
+def _write_valueset(cs_url: str, concepts: Iterable[tuple[str, str]]) -> None:
+    vs = build_valueset(cs_url, concepts)
+    slug = slug_from_url(cs_url)
+    out_path = OUTPUT_DIR / f"{slug}_valueset.json"
+    if orjson is not None:
+        with open(out_path, "wb") as f:
+            f.write(orjson.dumps(vs, option=orjson.OPT_INDENT_2))
+    else:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(vs, f, indent=2, ensure_ascii=False)
+    print(f"✅ Wrote ValueSet for {cs_url} to {out_path}")
+
+
 def main():
-    conn = sqlite3.connect(DB_PATH)
+    conn = open_db()
     cur = conn.cursor()
 
     # Fetch all CodeSystem URLs
     cur.execute("SELECT url FROM CodeSystem")
     systems = [row[0] for row in cur.fetchall() if row[0]]
 
+    # One pass over every concept, grouped by system URL; rows stream in fetchmany-sized chunks
+    cur.arraysize = 10000
+    cur.execute(
+        """
+        SELECT s.url, c.code, COALESCE(c.display, '')
+        FROM Concept c
+        JOIN CodeSystem s ON s.id = c.codesystem_id
+        WHERE s.url IS NOT NULL AND s.url != ''
+        ORDER BY s.url, c.code
+        """
+    )
+    rows = (row for batch in iter(cur.fetchmany, []) for row in batch)
+    written = set()
+    for cs_url, group in groupby(rows, key=itemgetter(0)):
+        _write_valueset(cs_url, ((code, display) for _, code, display in group))
+        written.add(cs_url)
+    # Systems without concepts still get an (empty) ValueSet
     for cs_url in systems:
-        cur.execute(
-            """
-            SELECT c.code, COALESCE(c.display, '')
-            FROM Concept c
-            JOIN CodeSystem s ON s.id = c.codesystem_id
-            WHERE s.url = ?
-            ORDER BY c.code
-            """,
-            (cs_url,)
-        )
-        concepts = cur.fetchall()
-        vs = build_valueset(cs_url, concepts)
-        slug = slug_from_url(cs_url)
-        out_path = OUTPUT_DIR / f"{slug}_valueset.json"
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(vs, f, indent=2, ensure_ascii=False)
-        print(f"✅ Wrote ValueSet for {cs_url} to {out_path}")
+        if cs_url not in written:
+            _write_valueset(cs_url, ())
 
     conn.close()
 
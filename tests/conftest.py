@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
+from typing import Iterator
 import pytest
 from fastapi.testclient import TestClient
 
@@ -11,8 +12,11 @@ from api.main import app
 
 
 @pytest.fixture(scope="session")
-def client() -> TestClient:
-    return TestClient(app)
+def client() -> Iterator[TestClient]:
+    # One client (and its portal/event loop) reused by every test and closed at session end;
+    # any lifespan handlers the app defines later would run once here, not per test
+    with TestClient(app) as c:
+        yield c
 
 
 @pytest.fixture(scope="session")
@@ -0,0 +1,105 @@
+# tests/test_conceptmap_persist.py
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import scripts.step4_generate_conceptmaps as s4
+
+SRC_URL = "http://example.org/fhir/src"
+TGT_URL = "http://example.org/fhir/tgt"
+
+
+def _make_db(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.executescript(
+        """
+        CREATE TABLE CodeSystem (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL UNIQUE);
+        CREATE TABLE ConceptMap (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_codesystem_id INTEGER NOT NULL,
+            source_code TEXT NOT NULL,
+            target_codesystem_id INTEGER NOT NULL,
+            target_code TEXT NOT NULL,
+            mapping_type TEXT NOT NULL,
+            confidence REAL,
+            UNIQUE(source_codesystem_id, source_code, target_codesystem_id, target_code)
+        );
+        """
+    )
+    conn.executemany("INSERT INTO CodeSystem (url) VALUES (?)", [(SRC_URL,), (TGT_URL,)])
+    conn.commit()
+    s4.ensure_schema(conn)
+    return conn
+
+
+class _NoBulkConn:
+    """Connection wrapper that rejects multi-row VALUES and executemany, forcing persist_db's row-by-row path."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def execute(self, sql, params=()):
+        if sql.count(s4._ROW_PLACEHOLDERS) > 1:
+            raise sqlite3.OperationalError("multi-row VALUES disabled")
+        return self._conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        raise sqlite3.OperationalError("executemany disabled")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+def _groups(n: int):
+    maps = []
+    for i in range(n):
+        maps.append({
+            "source_code": f"S{i % 700}",
+            "target_code": f"T{i % 3}",  # (S, T) pairs are unique for i < 2100
+            "mapping_type": "related-to",
+            "confidence": i / 10.0,
+            "src_lang": "hin_Deva",
+            "translated_text": f"text {i}",
+            "backtranslation_similarity": 90.0,
+            "source_display": f"src {i}",
+            "target_display": f"tgt {i % 3}",
+        })
+        if i % 50 == 0:
+            maps.append(dict(maps[-1], confidence=-1.0))  # duplicate key: INSERT OR IGNORE keeps the first
+    return [("Target", TGT_URL, maps)]
+
+
+def _dump(conn: sqlite3.Connection):
+    return conn.execute("SELECT * FROM ConceptMap ORDER BY id").fetchall()
+
+
+@pytest.mark.parametrize("chunk", [500, 90])
+def test_persist_db_bulk_matches_row_by_row(tmp_path: Path, monkeypatch, chunk: int):
+    monkeypatch.setattr(s4, "_INSERT_CHUNK", chunk)
+    groups = _groups(1234)  # several full chunks plus an executemany remainder
+
+    bulk = _make_db(tmp_path / "bulk.db")
+    s4.persist_db(bulk, SRC_URL, groups)
+
+    ref = _make_db(tmp_path / "ref.db")
+    s4.persist_db(_NoBulkConn(ref), SRC_URL, groups)
+
+    rows = _dump(bulk)
+    assert len(rows) == 1234
+    assert rows == _dump(ref)
+    assert all(r[6] >= 0 for r in rows)  # duplicates never replaced the first mapping
+
+
+def test_persist_db_skips_unknown_codesystems(tmp_path: Path):
+    conn = _make_db(tmp_path / "t.db")
+    s4.persist_db(conn, "http://example.org/fhir/unknown", _groups(10))
+    assert _dump(conn) == []
@@ -0,0 +1,78 @@
+# tests/test_fetch_icd11_retries.py
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import pytest
+
+import scripts.step2_fetch_icd11 as s2
+
+
+@pytest.fixture
+def fetcher(tmp_path: Path, monkeypatch):
+    """Route fetch_icd11 through a scripted mock transport; records sleeps instead of waiting."""
+    statuses: Dict[str, List[int]] = {}
+    sleeps: List[float] = []
+    real_sleep = asyncio.sleep
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        key = request.url.path.rsplit("/", 1)[-1]
+        status = statuses[key].pop(0)
+        headers = {"Retry-After": "2"} if status == 429 else {}
+        return httpx.Response(status, json={"code": key, "child": []}, headers=headers)
+
+    async def fake_sleep(delay, *args, **kwargs):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(s2, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(s2, "CACHED", set())
+    monkeypatch.setattr(s2, "FAILED", {})
+    monkeypatch.setattr(s2, "TOKEN", "test-token")
+    monkeypatch.setattr(s2.asyncio, "sleep", fake_sleep)
+
+    def fetch(key: str, script: List[int]):
+        statuses[key] = list(script)
+
+        async def run():
+            s2.CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                return await s2.fetch_icd11(f"https://id.who.int/icd/test/{key}")
+            finally:
+                await s2.CLIENT.aclose()
+
+        return asyncio.run(run()), statuses[key]
+
+    original_client = s2.CLIENT
+    yield fetch, sleeps
+    s2.CLIENT = original_client
+
+
+def test_429_waits_do_not_consume_attempts(fetcher):
+    fetch, sleeps = fetcher
+    # More 429s plus 5xx than MAX_ATTEMPTS in total, but only MAX_ATTEMPTS - 1 real failures
+    script = [429] * 5 + [503] * (s2.MAX_ATTEMPTS - 1) + [200]
+    data, left = fetch("ok", script)
+    assert data == {"code": "ok", "child": []}
+    assert left == []
+    assert sleeps[:5] == [2.0] * 5  # Retry-After honoured
+    assert not s2.FAILED
+
+
+def test_5xx_gives_up_after_budget_and_records_url(fetcher):
+    fetch, _ = fetcher
+    data, left = fetch("down", [503] * (s2.MAX_ATTEMPTS + 3))
+    assert data is None
+    assert len(left) == 3  # exactly MAX_ATTEMPTS requests were made
+    assert s2.FAILED == {"https://id.who.int/icd/test/down": "HTTP 503"}
+
+
+def test_client_errors_are_not_retried(fetcher):
+    fetch, _ = fetcher
+    data, left = fetch("missing", [404, 200])
+    assert data is None
+    assert left == [200]
+    assert "https://id.who.int/icd/test/missing" in s2.FAILED
@@ -0,0 +1,26 @@
+# tests/test_normalize_text.py
+from __future__ import annotations
+
+import pytest
+
+import scripts.step4_generate_conceptmaps as s4
+
+
+@pytest.fixture
+def no_unidecode(monkeypatch):
+    # Exercise the NFKD fallback used when unidecode is not installed
+    monkeypatch.setattr(s4, "_unidecode", None)
+    s4._normalize_text.cache_clear()
+    yield
+    s4._normalize_text.cache_clear()
+
+
+def test_variants_are_normalized(no_unidecode):
+    assert s4._normalize_text("Anaemia with Oedema") == "anemia with edema"
+    assert s4._normalize_text("Haemorrhage, foetal") == "hemorrhage fetal"
+
+
+def test_unicode_case_variant_does_not_raise(no_unidecode):
+    # re.IGNORECASE matches dotless "ı" against "i"; .lower() does not map it back
+    assert s4._normalize_text("anaemıa") == "anemia"
+    assert s4._normalize_text("ANAEMIA") == "anemia"
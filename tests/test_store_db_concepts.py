@@ -0,0 +1,65 @@
+# tests/test_store_db_concepts.py
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import scripts.step3_store_db as s3
+
+
+@pytest.fixture
+def concept_db(tmp_path: Path, monkeypatch) -> sqlite3.Connection:
+    # insert_concepts writes through the module-level cursor; point it at a scratch DB
+    conn = sqlite3.connect(str(tmp_path / "t.db"))
+    conn.executescript(
+        """
+        CREATE TABLE Concept (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codesystem_id INTEGER NOT NULL,
+            code TEXT NOT NULL,
+            display TEXT,
+            definition TEXT,
+            UNIQUE(codesystem_id, code)
+        );
+        """
+    )
+    monkeypatch.setattr(s3, "cursor", conn.cursor())
+    yield conn
+    conn.close()
+
+
+def _concepts(conn: sqlite3.Connection):
+    return conn.execute("SELECT codesystem_id, code, display, definition FROM Concept ORDER BY codesystem_id, code").fetchall()
+
+
+def test_insert_concepts_keeps_existing_without_merge(concept_db):
+    s3.insert_concepts(1, [("A1", "Fever", "old"), ("A2", "Cough", ""), ("", "no code", "")])
+    s3.insert_concepts(1, [("A1", "Jvara", "new"), ("A3", "Cold", "")])
+    assert _concepts(concept_db) == [
+        (1, "A1", "Fever", "old"),
+        (1, "A2", "Cough", ""),
+        (1, "A3", "Cold", ""),
+    ]
+
+
+def test_insert_concepts_merge_refreshes_non_empty_fields(concept_db):
+    s3.insert_concepts(1, [("A1", "Fever", "old"), ("A2", "Cough", "dry")])
+    s3.insert_concepts(2, [("A1", "Other system", "")])
+    s3.insert_concepts(1, [("A1", "Jvara", ""), ("A2", "", "wet")], merge=True)
+    assert _concepts(concept_db) == [
+        (1, "A1", "Jvara", "old"),
+        (1, "A2", "Cough", "wet"),
+        (2, "A1", "Other system", ""),
+    ]
+
+
+def test_insert_concepts_integrity_error_only_skips_bad_rows(concept_db, capsys):
+    concept_db.execute(
+        "CREATE TRIGGER reject_bad BEFORE INSERT ON Concept WHEN NEW.code = 'BAD' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    )
+    s3.insert_concepts(1, [("A1", "Fever", ""), ("BAD", "Broken", ""), ("A2", "Cough", "")])
+    assert _concepts(concept_db) == [(1, "A1", "Fever", ""), (1, "A2", "Cough", "")]
+    assert "Concept insert error for BAD" in capsys.readouterr().out